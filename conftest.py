@@ -0,0 +1 @@
+# リポジトリ直下を import パスに入れる（tests/ から core, primitive を import するため）
@@ -1,6 +1,6 @@
 # core/camera.py
 from math import sin, cos, radians
-from panda3d.core import Point3, Vec3, KeyboardButton
+from panda3d.core import Point3, Vec3, Quat, NodePath, KeyboardButton
 from direct.showbase.ShowBase import ShowBase
 from direct.task import Task
 
@@ -49,6 +49,9 @@ class OrbitCamera:
 
         self._task_name = "orbit_camera_update"
 
+        # ピック（Alt無しの左クリック）時に呼ぶ: on_pick(origin, direction) ※render座標
+        self.on_pick = None
+
         # 入力バインド
         a = self.base.accept
         a("mouse1", self._on_mouse1_down)
@@ -73,11 +76,27 @@ class OrbitCamera:
         self.target = Point3(p)
         self._update_camera_pos()
 
+    def get_view_ray(self):
+        """マウス位置を通る視線レイを (origin, direction) で返す（render座標）。マウス外なら None"""
+        if not self.base.mouseWatcherNode.has_mouse():
+            return None
+        mpos = self.base.mouseWatcherNode.get_mouse()
+        near, far = Point3(), Point3()
+        if not self.base.camLens.extrude(mpos, near, far):
+            return None
+        origin = self.base.render.get_relative_point(self.base.cam, near)
+        end = self.base.render.get_relative_point(self.base.cam, far)
+        return origin, Vec3(end - origin)
+
     # ========== 入力ハンドラ ==========
     def _on_mouse1_down(self):
         # Alt + 左ドラッグで回転（Unity風）
         if self._alt_down():
             self._begin_rotate()
+        elif self.on_pick is not None:
+            ray = self.get_view_ray()
+            if ray is not None:
+                self.on_pick(*ray)
 
     def _on_mouse1_up(self):
         # マウスアップ時は修飾キー状態に依存せず終了させる
@@ -191,3 +210,43 @@ class OrbitCamera:
             mods.is_down(KeyboardButton.lalt()) or
             mods.is_down(KeyboardButton.ralt())
         )
+
+
+class ChaseCamera:
+    """対象の後方上空から追従（対象のヘディングのみ追従し、ロール/ピッチは無視）"""
+    def __init__(self, cam_np: NodePath, distance: float = 1.5, height: float = 0.6):
+        self.cam_np = cam_np
+        self.distance = distance
+        self.height = height
+
+    def update(self, target: NodePath):
+        parent = self.cam_np.get_parent()
+        q = Quat()
+        q.set_hpr(Vec3(target.get_h(parent), 0, 0))
+        pos = target.get_pos(parent)
+        # Panda3D では機体前方が +Y（Frame.to_panda3d 参照）
+        self.cam_np.set_pos(pos + q.xform(Vec3(0, -self.distance, self.height)))
+        self.cam_np.look_at(pos)
+
+
+class TopDownCamera:
+    """対象の真上から見下ろす（画面上方向 = ワールド +Y）"""
+    def __init__(self, cam_np: NodePath, height: float = 5.0):
+        self.cam_np = cam_np
+        self.height = height
+
+    def update(self, target: NodePath):
+        pos = target.get_pos(self.cam_np.get_parent())
+        self.cam_np.set_pos(pos + Vec3(0, 0, self.height))
+        self.cam_np.look_at(pos, Vec3(0, 1, 0))
+
+
+class FirstPersonCamera:
+    """機体に固定した一人称視点"""
+    def __init__(self, cam_np: NodePath, offset: Vec3 = Vec3(0, 0.1, 0.05)):
+        self.cam_np = cam_np
+        self.offset = Vec3(offset)
+
+    def update(self, target: NodePath):
+        self.cam_np.set_pos(target, self.offset)
+        self.cam_np.set_hpr(target, 0, 0, 0)
@@ -0,0 +1,326 @@
+# core/pose_stream.py
+import ipaddress
+import random
+import socket
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (pos xyz, hpr[deg], rotor_speed) … Panda3D座標系
+PoseState = Tuple[Tuple[float, float, float], Tuple[float, float, float], float]
+
+MAGIC = b"HKPS"
+KIND_KEYFRAME = 0
+KIND_DELTA = 1
+
+# ヘッダ: magic, 種別, セッションID, シーケンス番号, 基準キーフレーム番号,
+#         全エンティティ数, このデータグラムが担当する範囲 [start, end), エントリ数
+_HEADER = struct.Struct("<4sBIIIIIIH")
+_NAME_LEN = struct.Struct("<B")
+_KEY_VALUES = struct.Struct("<7i")
+_DELTA_ENTRY = struct.Struct("<IB")
+_DELTA_VALUE = struct.Struct("<h")
+
+# 量子化ステップ: 位置 1mm / 角度 0.01deg / ロータ 0.1
+_SCALES = (1000.0, 1000.0, 1000.0, 100.0, 100.0, 100.0, 10.0)
+_INT16_MIN, _INT16_MAX = -32768, 32767
+
+MAX_NAME_BYTES = 255
+# 受信時に受け付けるエンティティ数の上限（不正なヘッダで巨大な確保をしないため）
+MAX_ENTITIES = 1 << 20
+# UDP データグラムの実用上限（受信バッファ）
+MAX_DATAGRAM = 65507
+# 送信時の分割単位（IP フラグメントを避けるため MTU 以下）
+DEFAULT_CHUNK_BYTES = 1400
+
+
+def quantize(state: PoseState) -> Tuple[int, ...]:
+    pos, hpr, rotor = state
+    values = (pos[0], pos[1], pos[2], hpr[0], hpr[1], hpr[2], rotor)
+    return tuple(int(round(v * s)) for v, s in zip(values, _SCALES))
+
+
+def dequantize(q: Tuple[int, ...]) -> PoseState:
+    v = [x / s for x, s in zip(q, _SCALES)]
+    return (v[0], v[1], v[2]), (v[3], v[4], v[5]), v[6]
+
+
+def parse_addr(text: str, default_host: str = "127.0.0.1") -> Tuple[str, int]:
+    """
+    'host:port' を (host, port) に変換。host 省略時は default_host。
+    受信側は default_host="" にすると全インタフェースで待ち受ける。
+    """
+    host, _, port = text.rpartition(":")
+    return (host or default_host), int(port)
+
+
+class PoseStreamEncoder:
+    """
+    フリート状態をキーフレーム + 差分のデータグラム列に符号化する。
+      - キーフレーム: 名前 + 全エンティティの量子化値(int32)
+      - 差分       : 直前のキーフレームから変化した成分だけを int16 で送る
+    差分は常に「直前のキーフレーム」基準なので、UDPで途中のパケットを
+    落としても次のパケットからそのまま復元できる。
+    静止しているエンティティは差分に載らないため、帯域は動いている機体数に比例する。
+    1フレームが chunk_bytes を超える場合はエンティティ範囲ごとに分割する。
+    """
+    def __init__(self, keyframe_interval: int = 30, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 session: Optional[int] = None):
+        self.keyframe_interval = keyframe_interval
+        self.chunk_bytes = chunk_bytes
+        # 送信側の再起動を受信側が見分けるための ID
+        self.session = random.getrandbits(32) if session is None else session
+        self._seq = 0
+        self._key_seq = 0
+        self._key_names: List[str] = []
+        self._key_values: Dict[str, Tuple[int, ...]] = {}
+        self._since_key = 0
+
+    def encode(self, states: Dict[str, PoseState]) -> List[bytes]:
+        for name in states:
+            if len(name.encode("utf-8")) > MAX_NAME_BYTES:
+                raise ValueError(f"entity name too long for pose stream: {name!r}")
+        quantized = {name: quantize(s) for name, s in states.items()}
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+
+        need_key = (
+            self._since_key >= self.keyframe_interval
+            or set(quantized) != set(self._key_values)
+        )
+        if not need_key:
+            chunks = self._encode_delta(quantized)
+            if chunks is not None:
+                self._since_key += 1
+                return chunks
+        return self._encode_keyframe(quantized)
+
+    def _encode_keyframe(self, quantized: Dict[str, Tuple[int, ...]]) -> List[bytes]:
+        self._key_seq = self._seq
+        self._key_names = list(quantized)
+        self._key_values = dict(quantized)
+        self._since_key = 0
+
+        entries = []
+        for index, name in enumerate(self._key_names):
+            raw = name.encode("utf-8")
+            entries.append((index, _NAME_LEN.pack(len(raw)) + raw + _KEY_VALUES.pack(*quantized[name])))
+        return self._pack(KIND_KEYFRAME, entries)
+
+    def _encode_delta(self, quantized: Dict[str, Tuple[int, ...]]) -> Optional[List[bytes]]:
+        """int16 に収まらない変化があれば None（キーフレームに切り替える）"""
+        entries = []
+        for index, name in enumerate(self._key_names):
+            base = self._key_values[name]
+            cur = quantized[name]
+            mask = 0
+            values = []
+            for i, (b, c) in enumerate(zip(base, cur)):
+                d = c - b
+                if d == 0:
+                    continue
+                if d < _INT16_MIN or d > _INT16_MAX:
+                    return None
+                mask |= 1 << i
+                values.append(_DELTA_VALUE.pack(d))
+            if mask:
+                entries.append((index, _DELTA_ENTRY.pack(index, mask) + b"".join(values)))
+        return self._pack(KIND_DELTA, entries)
+
+    def _pack(self, kind: int, entries: List[Tuple[int, bytes]]) -> List[bytes]:
+        """エントリを chunk_bytes 以下のデータグラムに詰める。各データグラムは [start, end) を担当。"""
+        total = len(self._key_names)
+        budget = self.chunk_bytes - _HEADER.size
+        chunks = []
+        start = 0
+        body: List[bytes] = []
+        size = 0
+        for index, entry in entries:
+            if body and size + len(entry) > budget:
+                chunks.append(self._chunk(kind, total, start, index, body))
+                start, body, size = index, [], 0
+            body.append(entry)
+            size += len(entry)
+        chunks.append(self._chunk(kind, total, start, total, body))
+        return chunks
+
+    def _chunk(self, kind: int, total: int, start: int, end: int, body: List[bytes]) -> bytes:
+        header = _HEADER.pack(MAGIC, kind, self.session, self._seq, self._key_seq,
+                              total, start, end, len(body))
+        return header + b"".join(body)
+
+
+class PoseStreamDecoder:
+    """
+    PoseStreamEncoder の出力を復元する。キーフレームが揃うまでは何も返さない。
+    セッションIDが変わったら（送信側の再起動）状態を捨てて受け直す。
+    """
+    def __init__(self):
+        self._reset(None)
+
+    def _reset(self, session: Optional[int]):
+        self._session = session
+        self._last_seq: Optional[int] = None
+        self._key_seq: Optional[int] = None
+        self._key_names: List[str] = []
+        self._key_values: List[Tuple[int, ...]] = []
+        self._current: List[List[int]] = []
+        # 組み立て中のキーフレーム
+        self._pending_seq: Optional[int] = None
+        self._pending_names: List[Optional[str]] = []
+        self._pending_values: List[Optional[Tuple[int, ...]]] = []
+        self._pending_filled = 0
+
+    def decode(self, data: bytes) -> bool:
+        """
+        データグラムを1つ取り込む。復元済みの状態が更新されたら True。
+        壊れた/無関係なデータグラムは状態を変えずに False を返す。
+        """
+        try:
+            return self._decode(data)
+        except (struct.error, UnicodeDecodeError):
+            return False
+
+    def _decode(self, data: bytes) -> bool:
+        if len(data) < _HEADER.size:
+            return False
+        magic, kind, session, seq, key_seq, total, start, end, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or not 0 <= start <= end <= total <= MAX_ENTITIES or count > end - start:
+            return False
+
+        # 状態に触る前にデータグラム全体を解析・検証する
+        offset = _HEADER.size
+        if kind == KIND_KEYFRAME:
+            if count != end - start:
+                return False
+            entries = []
+            for _ in range(count):
+                (n,) = _NAME_LEN.unpack_from(data, offset)
+                offset += _NAME_LEN.size
+                if offset + n > len(data):
+                    return False
+                name = data[offset:offset + n].decode("utf-8")
+                offset += n
+                entries.append((name, _KEY_VALUES.unpack_from(data, offset)))
+                offset += _KEY_VALUES.size
+        elif kind == KIND_DELTA:
+            entries = []
+            for _ in range(count):
+                index, mask = _DELTA_ENTRY.unpack_from(data, offset)
+                offset += _DELTA_ENTRY.size
+                if not start <= index < end:
+                    return False
+                deltas = []
+                for i in range(7):
+                    if mask & (1 << i):
+                        (d,) = _DELTA_VALUE.unpack_from(data, offset)
+                        offset += _DELTA_VALUE.size
+                        deltas.append((i, d))
+                entries.append((index, deltas))
+        else:
+            return False
+
+        if session != self._session:
+            self._reset(session)
+        # 順序が入れ替わった古いパケットは捨てる（同一フレームの分割分は同じ seq）
+        if self._last_seq is not None and ((seq - self._last_seq) & 0xFFFFFFFF) >= 0x80000000:
+            return False
+        self._last_seq = seq
+
+        if kind == KIND_KEYFRAME:
+            if key_seq != self._pending_seq or len(self._pending_names) != total:
+                self._pending_seq = key_seq
+                self._pending_names = [None] * total
+                self._pending_values = [None] * total
+                self._pending_filled = 0
+            for index, (name, values) in enumerate(entries, start):
+                if self._pending_names[index] is None:
+                    self._pending_filled += 1
+                self._pending_names[index] = name
+                self._pending_values[index] = values
+            if self._pending_filled < total or key_seq == self._key_seq:
+                return False
+            self._key_seq = key_seq
+            self._key_names = list(self._pending_names)
+            self._key_values = list(self._pending_values)
+            self._current = [list(v) for v in self._key_values]
+            return True
+
+        if key_seq != self._key_seq or total != len(self._key_names):
+            # 基準キーフレームを持っていない差分は復元できない
+            return False
+        current = self._current
+        for index in range(start, end):
+            current[index] = list(self._key_values[index])
+        for index, deltas in entries:
+            for i, d in deltas:
+                current[index][i] += d
+        return True
+
+    def states(self) -> Dict[str, PoseState]:
+        return {name: dequantize(v) for name, v in zip(self._key_names, self._current)}
+
+
+class PoseStreamPublisher:
+    """
+    UDP でフリート状態を配信する。
+    1フレームの符号化は1回だけで、同じデータグラムを各ビューアへ送る。
+    宛先にマルチキャストアドレスを指定すればビューア数に依らず送信は1回で済む。
+    """
+    def __init__(self, destinations: Iterable[Tuple[str, int]], keyframe_interval: int = 30,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        self.destinations = list(destinations)
+        self.encoder = PoseStreamEncoder(keyframe_interval=keyframe_interval, chunk_bytes=chunk_bytes)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self._rejected = set()
+
+    def publish(self, states: Dict[str, PoseState]) -> int:
+        """送信したバイト数（1ビューアあたり）を返す"""
+        valid = {}
+        for name, state in states.items():
+            if len(name.encode("utf-8")) <= MAX_NAME_BYTES:
+                valid[name] = state
+            elif name not in self._rejected:
+                # 配信ループを止めないよう、名前が長すぎる機体は警告して除外する
+                self._rejected.add(name)
+                print(f"[PoseStream] entity name too long, not published: {name[:32]}...")
+        sent = 0
+        for data in self.encoder.encode(valid):
+            sent += len(data)
+            for addr in self.destinations:
+                try:
+                    self.sock.sendto(data, addr)
+                except OSError as e:
+                    # 1つのビューアが落ちていても他への配信は続ける
+                    print(f"[PoseStream] send to {addr} failed: {e}")
+        return sent
+
+    def close(self):
+        self.sock.close()
+
+
+class PoseStreamSubscriber:
+    """ノンブロッキングで受信し、最新のフリート状態を返す（描画タスクから呼ぶ）"""
+    def __init__(self, bind_addr: Tuple[str, int]):
+        self.decoder = PoseStreamDecoder()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        host = socket.gethostbyname(bind_addr[0]) if bind_addr[0] else "0.0.0.0"
+        self.sock.bind((host, bind_addr[1]))
+        if ipaddress.ip_address(host).is_multicast:
+            # マルチキャストグループへ参加
+            mreq = struct.pack("<4s4s", socket.inet_aton(host), socket.inet_aton("0.0.0.0"))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        self.sock.setblocking(False)
+
+    def poll(self) -> Optional[Dict[str, PoseState]]:
+        updated = False
+        while True:
+            try:
+                data = self.sock.recv(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                break
+            updated = self.decoder.decode(data) or updated
+        return self.decoder.states() if updated else None
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,349 @@
+# core/spatial_index.py
+from math import floor, sqrt, inf
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+Vec = Tuple[float, float, float]
+Cell = Tuple[int, int, int]
+
+
+class SpatialGrid:
+    """
+    疎な一様グリッド（セル -> キー集合のハッシュ）による空間インデックス。
+    エンティティの位置更新は O(1) で、近傍/半径/レイ問い合わせは
+    周辺セルだけを見るためフリート全体の数にはほぼ依存しない。
+
+    使い方:
+        grid = SpatialGrid(cell_size=1.0)
+        grid.update("Drone", (x, y, z))
+        grid.nearest((0, 0, 0), k=3)
+    """
+    def __init__(self, cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Set[Hashable]] = {}
+        self._pos: Dict[Hashable, Vec] = {}
+        self._cell_of: Dict[Hashable, Cell] = {}
+        # 占有セルの範囲 (lo, hi)。None は再計算が必要
+        self._bounds: Optional[Tuple[Cell, Cell]] = None
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._pos
+
+    def position(self, key: Hashable) -> Vec:
+        return self._pos[key]
+
+    # ========== 更新 ==========
+    def update(self, key: Hashable, pos) -> None:
+        p = (float(pos[0]), float(pos[1]), float(pos[2]))
+        cell = self._cell(p)
+        old = self._cell_of.get(key)
+        if old != cell:
+            if old is not None:
+                self._discard(old, key)
+            keys = self._cells.get(cell)
+            if keys is None:
+                keys = self._cells[cell] = set()
+                self._grow_bounds(cell)
+            keys.add(key)
+            self._cell_of[key] = cell
+        self._pos[key] = p
+
+    def remove(self, key: Hashable) -> None:
+        cell = self._cell_of.pop(key, None)
+        if cell is not None:
+            self._discard(cell, key)
+            del self._pos[key]
+
+    # ========== 問い合わせ ==========
+    def query_radius(self, center, radius: float) -> List[Tuple[Hashable, float]]:
+        """center から radius 以内のキーを (key, 距離) の距離順で返す"""
+        c = (center[0], center[1], center[2])
+        r2 = radius * radius
+        lo = self._cell((c[0] - radius, c[1] - radius, c[2] - radius))
+        hi = self._cell((c[0] + radius, c[1] + radius, c[2] + radius))
+        span = (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+
+        if span > len(self._cells):
+            # 半径が大きすぎるときは占有セルを直接なめた方が速い
+            cells = (k for cell in self._cells.values() for k in cell)
+        else:
+            cells = (k for cell in self._iter_box(lo, hi) for k in cell)
+
+        out = []
+        for key in cells:
+            d2 = _dist2(self._pos[key], c)
+            if d2 <= r2:
+                out.append((key, sqrt(d2)))
+        out.sort(key=lambda kv: kv[1])
+        return out
+
+    def nearest(self, center, k: int = 1, exclude: Optional[Hashable] = None) -> List[Tuple[Hashable, float]]:
+        """k 近傍を (key, 距離) の距離順で返す。セルを内側から殻状に広げて探索する。"""
+        c = (center[0], center[1], center[2])
+        origin = self._cell(c)
+        total = len(self._pos) - (1 if exclude in self._pos else 0)
+        k = min(k, total)
+        if k <= 0:
+            return []
+
+        found: List[Tuple[float, Hashable]] = []
+        seen = 0
+        ring = 0
+        while True:
+            shell_cells = (2 * ring + 1) ** 3 - max(0, 2 * ring - 1) ** 3
+            if shell_cells > len(self._cells):
+                # 疎な配置では殻の列挙より全点を直接なめた方が速い
+                found = [(_dist2(p, c), key) for key, p in self._pos.items() if key != exclude]
+                break
+            for cell in self._iter_shell(origin, ring):
+                for key in cell:
+                    if key == exclude:
+                        continue
+                    found.append((_dist2(self._pos[key], c), key))
+                    seen += 1
+            # ring 番目の殻まで見れば、未探索の点は ring*cell_size 以上離れている
+            if seen >= total:
+                break
+            if len(found) >= k:
+                found.sort(key=lambda dk: dk[0])
+                bound = ring * self.cell_size
+                if found[k - 1][0] <= bound * bound:
+                    break
+            ring += 1
+        found.sort(key=lambda dk: dk[0])
+        return [(key, sqrt(d2)) for d2, key in found[:k]]
+
+    def raycast(self, origin, direction, max_dist: float = 100.0, radius: float = 0.1) -> Optional[Tuple[Hashable, float]]:
+        """
+        レイ(origin + t*direction)に半径 radius の球として最初に当たるキーを (key, t) で返す。
+        3D DDA で通過セルだけを辿る。radius は cell_size 以下を想定。
+        """
+        o = (origin[0], origin[1], origin[2])
+        length = sqrt(direction[0] ** 2 + direction[1] ** 2 + direction[2] ** 2)
+        if length == 0.0 or not self._pos:
+            return None
+        d = (direction[0] / length, direction[1] / length, direction[2] / length)
+
+        # 占有セル範囲（隣接セル探索のぶん1セル広げる）の外は辿らない
+        cs = self.cell_size
+        lo, hi = self._get_bounds()
+        box_lo = [(lo[i] - 1) * cs for i in range(3)]
+        box_hi = [(hi[i] + 2) * cs for i in range(3)]
+        t0, t1 = 0.0, max_dist
+        for i in range(3):
+            if d[i] == 0.0:
+                if not box_lo[i] <= o[i] <= box_hi[i]:
+                    return None
+                continue
+            ta = (box_lo[i] - o[i]) / d[i]
+            tb = (box_hi[i] - o[i]) / d[i]
+            if ta > tb:
+                ta, tb = tb, ta
+            t0 = max(t0, ta)
+            t1 = min(t1, tb)
+        if t0 > t1:
+            return None
+
+        start = (o[0] + d[0] * t0, o[1] + d[1] * t0, o[2] + d[2] * t0)
+        cell = [min(max(c, lo[i] - 1), hi[i] + 1) for i, c in enumerate(self._cell(start))]
+        step = [0, 0, 0]
+        t_max = [inf, inf, inf]
+        t_delta = [inf, inf, inf]
+        for i in range(3):
+            if d[i] > 0:
+                step[i] = 1
+                t_max[i] = ((cell[i] + 1) * cs - o[i]) / d[i]
+                t_delta[i] = cs / d[i]
+            elif d[i] < 0:
+                step[i] = -1
+                t_max[i] = (cell[i] * cs - o[i]) / d[i]
+                t_delta[i] = -cs / d[i]
+
+        best: Optional[Tuple[Hashable, float]] = None
+        tested: Set[Hashable] = set()
+        t_enter = t0
+        while t_enter <= t1:
+            # 境界をまたぐ球を拾うため隣接セルも候補にする
+            base = (cell[0], cell[1], cell[2])
+            for nb in self._iter_box((base[0] - 1, base[1] - 1, base[2] - 1),
+                                     (base[0] + 1, base[1] + 1, base[2] + 1)):
+                for key in nb:
+                    if key in tested:
+                        continue
+                    tested.add(key)
+                    t = _ray_sphere(o, d, self._pos[key], radius)
+                    if t is not None and t <= max_dist and (best is None or t < best[1]):
+                        best = (key, t)
+            # これ以降のセルにはより手前の当たりは無い
+            if best is not None and best[1] + cs < t_enter:
+                break
+            axis = t_max.index(min(t_max))
+            t_enter = t_max[axis]
+            cell[axis] += step[axis]
+            t_max[axis] += t_delta[axis]
+        return best
+
+    def close_pairs(self, threshold: float) -> List[Tuple[Hashable, Hashable, float]]:
+        """距離 threshold 未満のペアを (a, b, 距離) で返す"""
+        order = {key: i for i, key in enumerate(self._pos)}
+        pairs = []
+        for a, pa in self._pos.items():
+            for b, dist in self.query_radius(pa, threshold):
+                if order[b] > order[a] and dist < threshold:
+                    pairs.append((a, b, dist))
+        return pairs
+
+    # ========== 内部 ==========
+    def _cell(self, p) -> Cell:
+        cs = self.cell_size
+        return (floor(p[0] / cs), floor(p[1] / cs), floor(p[2] / cs))
+
+    def _discard(self, cell: Cell, key: Hashable) -> None:
+        keys = self._cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self._cells[cell]
+            if self._bounds is not None:
+                lo, hi = self._bounds
+                if any(cell[i] == lo[i] or cell[i] == hi[i] for i in range(3)):
+                    self._bounds = None
+
+    def _grow_bounds(self, cell: Cell) -> None:
+        if self._bounds is None:
+            if len(self._cells) == 1:
+                self._bounds = (cell, cell)
+            return
+        lo, hi = self._bounds
+        self._bounds = (
+            (min(lo[0], cell[0]), min(lo[1], cell[1]), min(lo[2], cell[2])),
+            (max(hi[0], cell[0]), max(hi[1], cell[1]), max(hi[2], cell[2])),
+        )
+
+    def _get_bounds(self) -> Tuple[Cell, Cell]:
+        if self._bounds is None:
+            cells = list(self._cells)
+            self._bounds = (
+                tuple(min(c[i] for c in cells) for i in range(3)),
+                tuple(max(c[i] for c in cells) for i in range(3)),
+            )
+        return self._bounds
+
+    def _iter_box(self, lo: Cell, hi: Cell) -> Iterator[Set[Hashable]]:
+        cells = self._cells
+        for i in range(lo[0], hi[0] + 1):
+            for j in range(lo[1], hi[1] + 1):
+                for k in range(lo[2], hi[2] + 1):
+                    keys = cells.get((i, j, k))
+                    if keys:
+                        yield keys
+
+    def _iter_shell(self, origin: Cell, ring: int) -> Iterator[Set[Hashable]]:
+        """Chebyshev 距離がちょうど ring のセルを列挙"""
+        if ring == 0:
+            keys = self._cells.get(origin)
+            if keys:
+                yield keys
+            return
+        cells = self._cells
+        ox, oy, oz = origin
+        for i in range(-ring, ring + 1):
+            for j in range(-ring, ring + 1):
+                if abs(i) == ring or abs(j) == ring:
+                    ks = range(-ring, ring + 1)
+                else:
+                    ks = (-ring, ring)
+                for k in ks:
+                    keys = cells.get((ox + i, oy + j, oz + k))
+                    if keys:
+                        yield keys
+
+
+class ProximityTracker:
+    """
+    SpatialGrid 上で距離 threshold 未満の近接ペアを差分更新で保持する。
+    位置が変わったキーの近傍だけを query_radius で調べ直すので、
+    1フレームのコストは動いた機体数に比例し、フリート全体の数には依らない。
+
+    使い方:
+        tracker = ProximityTracker(grid, threshold=0.5)
+        grid.update("Drone", pos)
+        changed = tracker.update(["Drone"])   # 警告状態が変わったキー
+        tracker.is_warned("Drone")
+    """
+    def __init__(self, grid: SpatialGrid, threshold: float):
+        self.grid = grid
+        self.threshold = threshold
+        self._partners: Dict[Hashable, Set[Hashable]] = {}  # 空集合は持たない
+        self._warned: Set[Hashable] = set()
+
+    def is_warned(self, key: Hashable) -> bool:
+        return key in self._warned
+
+    def warned(self) -> Set[Hashable]:
+        return set(self._warned)
+
+    def pairs(self) -> List[Tuple[Hashable, Hashable]]:
+        out: Set[Tuple[Hashable, Hashable]] = set()
+        for a, partners in self._partners.items():
+            for b in partners:
+                if (b, a) not in out:
+                    out.add((a, b))
+        return list(out)
+
+    def update(self, keys) -> Set[Hashable]:
+        """keys（位置が変わった/grid から消えたキー）の近接関係を更新し、警告状態が変わったキーを返す"""
+        touched: Set[Hashable] = set()
+        for key in keys:
+            touched.add(key)
+            for other in self._partners.pop(key, ()):
+                self._unlink(other, key)
+                touched.add(other)
+            if key not in self.grid:
+                continue
+            for other, dist in self.grid.query_radius(self.grid.position(key), self.threshold):
+                if other != key and dist < self.threshold:
+                    self._partners.setdefault(key, set()).add(other)
+                    self._partners.setdefault(other, set()).add(key)
+                    touched.add(other)
+
+        changed = set()
+        for key in touched:
+            now = key in self._partners
+            if now != (key in self._warned):
+                changed.add(key)
+                if now:
+                    self._warned.add(key)
+                else:
+                    self._warned.discard(key)
+        return changed
+
+    def _unlink(self, key: Hashable, other: Hashable) -> None:
+        partners = self._partners.get(key)
+        if partners is not None:
+            partners.discard(other)
+            if not partners:
+                del self._partners[key]
+
+
+def _dist2(a: Vec, b: Vec) -> float:
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    dz = a[2] - b[2]
+    return dx * dx + dy * dy + dz * dz
+
+
+def _ray_sphere(o: Vec, d: Vec, c: Vec, r: float) -> Optional[float]:
+    """正規化済み方向 d のレイと球の最初の交差距離（当たらなければ None）"""
+    oc = (o[0] - c[0], o[1] - c[1], o[2] - c[2])
+    b = oc[0] * d[0] + oc[1] * d[1] + oc[2] * d[2]
+    q = oc[0] ** 2 + oc[1] ** 2 + oc[2] ** 2 - r * r
+    disc = b * b - q
+    if disc < 0:
+        return None
+    s = sqrt(disc)
+    t = -b - s
+    if t < 0:
+        t = -b + s
+    return t if t >= 0 else None
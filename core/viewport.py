@@ -0,0 +1,175 @@
+# core/viewport.py
+from panda3d.core import (
+    Camera, PerspectiveLens, NodePath, CardMaker, ClockObject
+)
+from direct.showbase.ShowBase import ShowBase
+from direct.showbase.DirectObject import DirectObject
+from direct.task import Task
+from typing import Callable, List, Optional, Tuple
+
+# (left, right, bottom, top) … ウィンドウに対する 0..1 の割合
+Region = Tuple[float, float, float, float]
+
+
+class SubView:
+    """
+    同じシーングラフを別カメラで描く副ビュー。
+    オフスクリーンバッファへ描いたテクスチャを画面の一部に貼り付けるので、
+    描画は rate_hz 回/秒に抑えつつ、間のフレームでも前回の絵を表示し続けられる。
+    バッファは更新時だけ one-shot で有効化し、それ以外のフレームは GPU コストを持たない。
+    """
+    def __init__(
+        self,
+        base: ShowBase,
+        name: str,
+        region: Region,
+        make_controller: Callable[[NodePath], object],
+        rate_hz: float = 10.0,
+        lod_scale: float = 0.5,
+        shadows: bool = False,
+    ):
+        self.base = base
+        self.name = name
+        self.rate_hz = rate_hz
+        self.region = region
+        self._elapsed = 0.0
+
+        left, right, bottom, top = region
+        width, height = self._pixel_size()
+
+        self.buffer = base.win.make_texture_buffer(f"{name}_buffer", width, height)
+        self.buffer.set_sort(-50)  # メインウィンドウより先に描く
+        self.buffer.set_clear_color_active(True)
+        self.buffer.set_clear_color(base.win.get_clear_color())
+        self.buffer.set_active(False)
+
+        self.lens = PerspectiveLens()
+        self.lens.set_aspect_ratio(width / height)
+        self.lens.set_near_far(0.05, 500.0)
+        cam = Camera(f"{name}_cam", self.lens)
+        # 副ビューは LOD を粗めに切り替える
+        cam.set_lod_scale(lod_scale)
+        if not shadows:
+            # render.setShaderAuto() を上書きして影/ピクセルライティングを省略
+            state_np = NodePath("state")
+            state_np.set_shader_off(1)
+            cam.set_initial_state(state_np.get_state())
+        self.cam_np = base.render.attach_new_node(cam)
+        self.buffer.make_display_region().set_camera(self.cam_np)
+
+        self.controller = make_controller(self.cam_np)
+
+        # 画面に貼るカード（render2d は -1..1）
+        cm = CardMaker(f"{name}_card")
+        cm.set_frame(left * 2 - 1, right * 2 - 1, bottom * 2 - 1, top * 2 - 1)
+        self.card = base.render2d.attach_new_node(cm.generate())
+        self.card.set_texture(self.buffer.get_texture())
+
+    def _pixel_size(self) -> Tuple[int, int]:
+        left, right, bottom, top = self.region
+        win = self.base.win
+        return (max(1, int(win.get_x_size() * (right - left))),
+                max(1, int(win.get_y_size() * (top - bottom))))
+
+    def resize(self):
+        """ウィンドウサイズに合わせてバッファとレンズのアスペクト比を更新"""
+        width, height = self._pixel_size()
+        if (width, height) == (self.buffer.get_x_size(), self.buffer.get_y_size()):
+            return
+        self.buffer.set_size(width, height)
+        self.lens.set_aspect_ratio(width / height)
+        self._elapsed = 1.0 / self.rate_hz  # すぐに描き直す
+
+    def update(self, dt: float, target: Optional[NodePath]):
+        interval = 1.0 / self.rate_hz
+        self._elapsed += dt
+        # 1/60 を6回足しても 0.1 にわずかに届かない、といった丸め誤差で1フレーム遅れないように
+        if self._elapsed + 1e-6 < interval:
+            return
+        # 端数を持ち越して平均レートを保つ（大きく遅れた分は捨てて、まとめ描きしない）
+        self._elapsed -= interval
+        if self._elapsed >= interval:
+            self._elapsed = 0.0
+        if target is not None:
+            self.controller.update(target)
+        # このフレームだけ描画して自動的に非アクティブへ戻る
+        self.buffer.set_one_shot(True)
+        self.buffer.set_active(True)
+
+    def show(self, on: bool):
+        if on:
+            self.card.show()
+            self._elapsed = 1.0 / self.rate_hz  # 表示直後に1回描く
+        else:
+            self.card.hide()
+            self.buffer.set_active(False)
+
+    def destroy(self):
+        self.card.remove_node()
+        self.cam_np.remove_node()
+        self.base.graphicsEngine.remove_window(self.buffer)
+
+
+class ViewportManager(DirectObject):
+    """
+    副ビューの集合を管理する。ウィンドウのリサイズにも追従する。
+
+    使い方:
+        views = ViewportManager(base, get_target=lambda: entity.np)
+        views.add("chase", (0.7, 1.0, 0.7, 1.0), lambda np: ChaseCamera(np), rate_hz=10)
+        views.enable()
+    """
+    def __init__(self, base: ShowBase, get_target: Callable[[], Optional[NodePath]]):
+        self.base = base
+        self.get_target = get_target
+        self.views: List[SubView] = []
+        self.visible = True
+        self._task_name = "viewport_update"
+        self.accept("window-event", self._on_window_event)
+
+    def add(self, name: str, region: Region, make_controller: Callable[[NodePath], object],
+            rate_hz: float = 10.0, **kwargs) -> SubView:
+        view = SubView(self.base, name, region, make_controller, rate_hz=rate_hz, **kwargs)
+        view.show(self.visible)
+        self.views.append(view)
+        return view
+
+    def enable(self):
+        self.base.taskMgr.add(self._update_task, self._task_name)
+
+    def disable(self):
+        self.base.taskMgr.remove(self._task_name)
+
+    def toggle(self):
+        self.visible = not self.visible
+        for view in self.views:
+            view.show(self.visible)
+
+    @staticmethod
+    def set_main_rate(hz: float):
+        """メインビュー（ウィンドウ全体のフレーム）の上限レート"""
+        clock = ClockObject.get_global_clock()
+        clock.set_mode(ClockObject.M_limited)
+        clock.set_frame_rate(hz)
+
+    def destroy(self):
+        """イベント・タスク・全副ビューを片付ける"""
+        self.ignoreAll()
+        self.disable()
+        for view in self.views:
+            view.destroy()
+        self.views = []
+
+    def _on_window_event(self, win):
+        if win == self.base.win:
+            for view in self.views:
+                view.resize()
+
+    def _update_task(self, task: Task):
+        if not self.visible:
+            return Task.cont
+        dt = ClockObject.get_global_clock().get_dt()
+        target = self.get_target()
+        for view in self.views:
+            view.update(dt, target)
+        return Task.cont
@@ -7,12 +7,16 @@ from hakoniwa_pdu.pdu_msgs.geometry_msgs.pdu_conv_Twist import pdu_to_py_Twist
 from hakoniwa_pdu.pdu_msgs.hako_mavlink_msgs.pdu_conv_HakoHilActuatorControls import pdu_to_py_HakoHilActuatorControls
 from visualizer import App
 from primitive.frame import Frame
+from primitive.point_cloud import pointcloud2_to_xyz, read_pointcloud2_pdu
+from core.pose_stream import PoseStreamPublisher, parse_addr
 import threading
 
 # === globals ===
 delta_time_usec = 0
 config_path = ''
 visualizer_runner: App = None
+pose_publisher: PoseStreamPublisher = None
+point_cloud_pdus = []  # [(robot_name, pdu_name), ...] sensor_msgs/PointCloud2
 
 def my_sleep():
     """箱庭シミュレータのクロックに同期してsleep"""
@@ -28,13 +32,16 @@ def run():
     手動タイミング制御ループ。
     各ドローン位置を監視し、環境プロパティから外乱(風/温度/気圧)をPDUに書き戻す。
     """
-    global config_path, visualizer_runner
+    global config_path, visualizer_runner, pose_publisher
     print("[Visualizer] Start Environment Control")
 
     pdu = PduManager()
     pdu.initialize(config_path=config_path, comm_service=ShmCommunicationService())
     pdu.start_service_nowait()
 
+    last_clouds = {}  # (robot_name, pdu_name) -> 前回の生データ
+    last_stamps = {}  # (robot_name, pdu_name) -> 前回の header.stamp
+
     # --- メインループ ---
     while True:
         if not my_sleep():
@@ -61,10 +68,39 @@ def run():
         #      f"roll={pose.angular.x:.2f} pitch={pose.angular.y:.2f} yaw={pose.angular.z:.2f} | "
         #      f"rotor_speed={rotor_speed:.2f}")
 
+        panda3d_pos, panda3d_orientation = Frame.to_panda3d(pose)
+
+        if pose_publisher is not None:
+            # デコード済みのフリート状態をリモートビューアへ配信
+            pose_publisher.publish({'Drone': (panda3d_pos, panda3d_orientation, rotor_speed)})
+
         if visualizer_runner is not None:
-            panda3d_pos, panda3d_orientation = Frame.to_panda3d(pose)
             visualizer_runner.set_pose_and_rotation(panda3d_pos, panda3d_orientation, rotor_speed)
 
+            # 点群はこのスレッドで変換・間引きまで済ませ、GPU への転送は描画タスクに任せる
+            for key in point_cloud_pdus:
+                try:
+                    raw_cloud = pdu.read_pdu_raw_data(*key)
+                    if not raw_cloud or raw_cloud == last_clouds.get(key):
+                        continue  # 更新されていないPDUはデコードしない
+                    raw_cloud = bytes(raw_cloud)
+                    last_clouds[key] = raw_cloud
+                    # data はリストに展開せず、生データをそのまま NumPy で参照する
+                    decoded = read_pointcloud2_pdu(raw_cloud)
+                    if decoded is None:
+                        continue
+                    cloud_msg, data = decoded
+                    stamp = (cloud_msg.header.stamp.sec, cloud_msg.header.stamp.nanosec)
+                    if stamp != (0, 0) and stamp == last_stamps.get(key):
+                        continue
+                    last_stamps[key] = stamp
+                    points = pointcloud2_to_xyz(cloud_msg, data)
+                    if points is not None:
+                        visualizer_runner.set_point_cloud(key, points)
+                except Exception as e:
+                    # 1つの壊れた点群でループ（姿勢の更新）を止めない
+                    print(f"[WARN] point cloud {key[0]}:{key[1]}: {e}")
+
     return 0
 
 def start_run_thread():
@@ -80,11 +116,41 @@ def stop_run_thread(thread):
 
 # === エントリポイント ===
 def main():
-    global delta_time_usec, config_path, visualizer_runner
-
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <config_path> <delta_time_msec>")
+    global delta_time_usec, config_path, visualizer_runner, pose_publisher
+
+    # オプション:
+    #   --publish host:port[,host:port...] : 画面を出さずに姿勢を配信するだけのモード
+    #   --point-cloud robot:pdu[,robot:pdu...] : PointCloud2 のPDUを点群として重ねて表示
+    #   --multi-view                        : チェイス/真上/一人称の副ビューを表示
+    options = sys.argv[3:]
+    multi_view = '--multi-view' in options
+    if multi_view:
+        options.remove('--multi-view')
+    usage = (f"Usage: {sys.argv[0]} <config_path> <delta_time_msec> "
+             f"[--publish host:port[,host:port...]] [--point-cloud robot:pdu[,robot:pdu...]] [--multi-view]")
+    if len(sys.argv) < 3 or len(options) % 2 != 0:
+        print(usage)
         return 1
+    for key, value in zip(options[0::2], options[1::2]):
+        if key == '--publish':
+            try:
+                destinations = [parse_addr(a) for a in value.split(',')]
+            except ValueError:
+                print(f"[ERROR] --publish expects host:port, got '{value}'")
+                print(usage)
+                return 1
+            pose_publisher = PoseStreamPublisher(destinations)
+        elif key == '--point-cloud':
+            for a in value.split(','):
+                robot_name, _, pdu_name = a.partition(':')
+                if not robot_name or not pdu_name:
+                    print(f"[ERROR] --point-cloud expects robot:pdu, got '{a}'")
+                    print(usage)
+                    return 1
+                point_cloud_pdus.append((robot_name, pdu_name))
+        else:
+            print(f"[ERROR] Unknown option: {key}")
+            return 1
 
     config_path = sys.argv[1]
     delta_time_usec = int(sys.argv[2]) * 1000
@@ -98,10 +164,19 @@ def main():
         return 1
 
     print("[Visualizer] Start simulation...")
+    if pose_publisher is not None:
+        print(f"[Visualizer] Publishing pose stream to {pose_publisher.destinations}")
+        run()
+        pose_publisher.close()
+        return 0
+
     # thread for run()
     t = start_run_thread()
 
-    visualizer_runner = App()
+    app = App(multi_view=multi_view)
+    for robot_name, pdu_name in point_cloud_pdus:
+        app.add_point_cloud((robot_name, pdu_name), robot=robot_name, voxel_size=0.05)
+    visualizer_runner = app
     visualizer_runner.run()
 
     stop_run_thread(t)
@@ -0,0 +1,205 @@
+import struct
+import numpy as np
+from hakoniwa_pdu.pdu_msgs import binary_io
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_pytype_PointCloud2 import PointCloud2
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_pytype_PointField import PointField
+from hakoniwa_pdu.pdu_msgs.std_msgs.pdu_conv_Header import binary_read_recursive_Header
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_conv_PointField import binary_read_recursive_PointField
+from panda3d.core import (
+    GeomNode, Geom, GeomVertexData, GeomVertexFormat, GeomPoints,
+    OmniBoundingVolume
+)
+from primitive.render import RenderEntity
+from typing import Optional, Tuple
+
+Color = Tuple[float, float, float, float]
+
+# PointCloud2 PDU のレイアウト（base 領域の先頭からのオフセット）
+_PDU_HEIGHT_WIDTH = 136    # uint32 x2
+_PDU_FIELDS = 144          # int32 要素数, int32 ヒープ内オフセット
+_PDU_IS_BIGENDIAN = 152
+_PDU_STEPS = 156           # uint32 point_step, row_step
+_PDU_DATA = 164            # int32 要素数, int32 ヒープ内オフセット
+_PDU_IS_DENSE = 172
+_PDU_BASE_SIZE = 176
+_PDU_POINT_FIELD_SIZE = 140
+_U32X2 = struct.Struct("<II")
+_I32X2 = struct.Struct("<ii")
+
+# sensor_msgs/PointField.datatype -> numpy dtype
+_POINT_FIELD_DTYPES = {
+    1: np.int8, 2: np.uint8, 3: np.int16, 4: np.uint16,
+    5: np.int32, 6: np.uint32, 7: np.float32, 8: np.float64,
+}
+
+
+class PointCloud(RenderEntity):
+    """
+    GeomPoints による点群表示。
+    頂点バッファは capacity 点分を最初に確保して使い回し、
+    毎フレームは NumPy でバッファへ一括コピーして描画点数だけを切り替える。
+    """
+    def __init__(self, parent, name: str = "point_cloud", capacity: int = 200_000,
+                 color: Color = (0.2, 1.0, 0.4, 1.0), point_size: float = 2.0,
+                 voxel_size: float = 0.0, budget: Optional[int] = None):
+        super().__init__(parent, name)
+        self.capacity = capacity
+        self.voxel_size = voxel_size  # 0 なら間引きなし
+        # prepare() 後の点数上限（capacity は確保するバッファの大きさ）
+        self.budget = capacity if budget is None else min(budget, capacity)
+        self.count = 0
+
+        self._vdata = GeomVertexData(name, GeomVertexFormat.get_v3(), Geom.UH_dynamic)
+        self._vdata.unclean_set_num_rows(capacity)
+        self._prim = GeomPoints(Geom.UH_dynamic)
+        self._prim.add_consecutive_vertices(0, 0)
+        geom = Geom(self._vdata)
+        geom.add_primitive(self._prim)
+        # 点の入れ替えごとにバウンディングを再計算させない
+        geom.set_bounds(OmniBoundingVolume())
+
+        node = GeomNode(name)
+        node.add_geom(geom)
+        node.set_bounds(OmniBoundingVolume())
+        node.set_final(True)
+        self._geom = geom
+        self._geom_np = self.np.attach_new_node(node)
+        self._geom_np.set_color(*color)
+        self._geom_np.set_render_mode_thickness(point_size)
+        self._geom_np.set_light_off()
+        self._geom_np.set_shader_off()
+
+    def prepare(self, points: np.ndarray) -> np.ndarray:
+        """
+        voxel_size / budget に従って間引いた (N, 3) float32 を返す。
+        Panda3D に触れないので、PDU 受信スレッド側で呼んで描画スレッドの負荷を避ける。
+        """
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        if self.voxel_size > 0.0:
+            pts = voxel_downsample(pts, self.voxel_size)
+        return limit_points(pts, self.budget)
+
+    def set_points(self, points: np.ndarray):
+        """prepare() 済みの点群を頂点バッファへコピーして表示する（描画スレッドから呼ぶ）"""
+        pts = limit_points(np.asarray(points, dtype=np.float32).reshape(-1, 3), self.capacity)
+        n = len(pts)
+
+        # 確保済みバッファへ直接書き込む（行数は capacity のまま）
+        array = self._geom.modify_vertex_data().modify_array(0)
+        buf = np.frombuffer(memoryview(array).cast("B"), dtype=np.float32).reshape(-1, 3)
+        buf[:n] = pts
+
+        prim = self._geom.modify_primitive(0)
+        prim.clear_vertices()
+        prim.add_consecutive_vertices(0, n)
+        self.count = n
+
+
+def voxel_downsample(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """ボクセルごとに最初の1点だけを残す（NaN/inf を含む点は捨てる）"""
+    points = points[np.isfinite(points).all(axis=1)]
+    if len(points) == 0:
+        return points
+    # 遠方の外れ値で int64 があふれないよう、ボクセル座標を丸めてから3列のまま一意化
+    q = np.clip(np.floor(points / voxel_size), -2.0 ** 62, 2.0 ** 62).astype(np.int64)
+    _, index = np.unique(q, axis=0, return_index=True)
+    return points[np.sort(index)]
+
+
+def limit_points(points: np.ndarray, budget: int) -> np.ndarray:
+    """点数が budget を超える場合は等間隔に間引く"""
+    n = len(points)
+    if n <= budget:
+        return points
+    step = -(-n // budget)
+    return points[::step][:budget]
+
+
+def read_pointcloud2_pdu(raw) -> Optional[Tuple[PointCloud2, memoryview]]:
+    """
+    PointCloud2 の PDU から data 以外のフィールドを読み出し、data は raw を参照する memoryview で返す。
+    pdu_to_py_PointCloud2() は data を int のリストに展開するので、大きな点群にはこちらを使う。
+    壊れた PDU は None。
+    """
+    meta = binary_io.PduMetaDataParser().load_pdu_meta(raw)
+    base = binary_io.PduMetaData.PDU_META_DATA_SIZE
+    if meta is None or len(raw) < base + _PDU_BASE_SIZE:
+        return None
+
+    msg = PointCloud2()
+    binary_read_recursive_Header(meta, raw, msg.header, base)
+    msg.height, msg.width = _U32X2.unpack_from(raw, base + _PDU_HEIGHT_WIDTH)
+
+    count, offset = _I32X2.unpack_from(raw, base + _PDU_FIELDS)
+    start = meta.heap_off + offset
+    if count < 0 or offset < 0 or start + count * _PDU_POINT_FIELD_SIZE > len(raw):
+        return None
+    for i in range(count):
+        field = PointField()
+        binary_read_recursive_PointField(meta, raw, field, start + i * _PDU_POINT_FIELD_SIZE)
+        msg.fields.append(field)
+
+    msg.is_bigendian = raw[base + _PDU_IS_BIGENDIAN] != 0
+    msg.point_step, msg.row_step = _U32X2.unpack_from(raw, base + _PDU_STEPS)
+    msg.is_dense = raw[base + _PDU_IS_DENSE] != 0
+
+    size, offset = _I32X2.unpack_from(raw, base + _PDU_DATA)
+    start = meta.heap_off + offset
+    if size < 0 or offset < 0 or start + size > len(raw):
+        return None
+    return msg, memoryview(raw)[start:start + size]
+
+
+def pointcloud2_to_xyz(msg, data=None) -> Optional[np.ndarray]:
+    """
+    sensor_msgs/PointCloud2 から (N, 3) float32 の xyz を取り出す。
+    座標は ROS(+X前,+Y左,+Z上) から Panda3D(+X右,+Y前,+Z上) に変換済み。
+    data を渡すと msg.data の代わりに使う（read_pointcloud2_pdu() の戻り値など）。
+    未対応の型やレイアウト、長さの足りないデータは None。
+    """
+    fields = {f.name: f for f in msg.fields}
+    if not all(k in fields for k in ("x", "y", "z")):
+        return None
+    xyz = [fields[k] for k in ("x", "y", "z")]
+    if any(f.datatype not in _POINT_FIELD_DTYPES for f in xyz):
+        return None
+
+    order = ">" if msg.is_bigendian else "<"
+    formats = [np.dtype(_POINT_FIELD_DTYPES[f.datatype]).newbyteorder(order) for f in xyz]
+    point_step = msg.point_step
+    # count>1 の要素は先頭だけ使う（0 は古いドライバで 1 の意味）
+    for f, fmt in zip(xyz, formats):
+        if f.offset < 0 or f.offset + fmt.itemsize * max(f.count, 1) > point_step:
+            return None
+
+    width, height = msg.width, msg.height
+    if width == 0 or height == 0:
+        return np.empty((0, 3), dtype=np.float32)
+    row_step = msg.row_step
+    if row_step < width * point_step:
+        return None
+
+    raw = msg.data if data is None else data
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        buf = np.frombuffer(raw, dtype=np.uint8)
+    else:
+        buf = np.asarray(raw, dtype=np.uint8)
+    if len(buf) < row_step * height:
+        return None
+
+    dtype = np.dtype({
+        "names": ["x", "y", "z"],
+        "formats": formats,
+        "offsets": [f.offset for f in xyz],
+        "itemsize": point_step,
+    })
+    # 行末のパディングを飛ばすため row_step / point_step の stride で参照する
+    rec = np.ndarray((height, width), dtype=dtype, buffer=buf, strides=(row_step, point_step))
+
+    out = np.empty((height * width, 3), dtype=np.float32)
+    out[:, 0] = rec["y"].reshape(-1)
+    out[:, 0] *= -1  # 符号なし整数でも回り込まないよう float32 にしてから反転
+    out[:, 1] = rec["x"].reshape(-1)
+    out[:, 2] = rec["z"].reshape(-1)
+    # 無効点(NaN/inf)は除外
+    return out[np.isfinite(out).all(axis=1)]
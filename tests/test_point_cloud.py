@@ -0,0 +1,125 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("panda3d")
+pytest.importorskip("hakoniwa_pdu")
+
+from panda3d.core import GeomVertexReader, NodePath
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_conv_PointCloud2 import py_to_pdu_PointCloud2
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_pytype_PointCloud2 import PointCloud2
+from hakoniwa_pdu.pdu_msgs.sensor_msgs.pdu_pytype_PointField import PointField
+
+from primitive.point_cloud import (
+    PointCloud, limit_points, pointcloud2_to_xyz, read_pointcloud2_pdu, voxel_downsample
+)
+
+FLOAT32 = 7
+
+
+def _cloud_msg(xyz, width=None, row_pad=0, point_step=16):
+    """float32 x,y,z（+パディング）の PointCloud2 を作る"""
+    xyz = np.asarray(xyz, dtype=np.float32)
+    width = len(xyz) if width is None else width
+    height = len(xyz) // width
+    msg = PointCloud2()
+    for i, name in enumerate("xyz"):
+        f = PointField()
+        f.name, f.offset, f.datatype, f.count = name, i * 4, FLOAT32, 1
+        msg.fields.append(f)
+    msg.width, msg.height = width, height
+    msg.point_step = point_step
+    msg.row_step = width * point_step + row_pad
+    data = bytearray()
+    for r in range(height):
+        for p in xyz[r * width:(r + 1) * width]:
+            data += p.tobytes() + bytes(point_step - 12)
+        data += bytes(row_pad)
+    msg.data = bytes(data)
+    return msg
+
+
+def test_voxel_downsample_keeps_first_point_per_voxel():
+    pts = np.array([[0.01, 0.01, 0.0], [0.02, 0.03, 0.0], [0.5, 0.0, 0.0],
+                    [np.nan, 0.0, 0.0], [0.04, 0.0, 0.01]], dtype=np.float32)
+    out = voxel_downsample(pts, 0.1)
+    assert out.tolist() == pts[[0, 2]].tolist()
+
+
+def test_voxel_downsample_survives_far_outliers():
+    # 旧実装は (x*dy + y)*dz + z が int64 をあふれて別ボクセルの点を潰していた
+    pts = np.array([[1e30, 0, 0], [-1e30, 0, 0], [0, 1e30, 0], [0, 0, 0],
+                    [0.5, 0, 0], [0, 0, 1e-3]], dtype=np.float32)
+    out = voxel_downsample(pts, 0.05)
+    assert len(out) == 5
+    assert out.tolist() == pts[:5].tolist()
+
+
+def test_limit_points():
+    pts = np.arange(30, dtype=np.float32).reshape(-1, 3)
+    assert limit_points(pts, 20) is pts
+    out = limit_points(pts, 4)
+    assert len(out) == 4
+    assert out[0].tolist() == pts[0].tolist()
+
+
+def test_pointcloud2_to_xyz_converts_axes_and_skips_row_padding():
+    xyz = [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]]
+    out = pointcloud2_to_xyz(_cloud_msg(xyz, width=2, row_pad=8))
+    assert out.tolist() == [[-y, x, z] for x, y, z in xyz]
+
+
+def test_pointcloud2_to_xyz_rejects_bad_layouts():
+    msg = _cloud_msg([[1, 2, 3], [4, 5, 6]])
+    msg.data = msg.data[:-1]
+    assert pointcloud2_to_xyz(msg) is None  # row_step*height に足りない
+
+    msg = _cloud_msg([[1, 2, 3]])
+    msg.fields[2].datatype = 99
+    assert pointcloud2_to_xyz(msg) is None  # 未対応の型
+
+    msg = _cloud_msg([[1, 2, 3]])
+    msg.fields[2].count = 2
+    msg.point_step = 12
+    msg.row_step = 12
+    msg.data = msg.data[:12]
+    assert pointcloud2_to_xyz(msg) is None  # 要素が point_step をはみ出す
+
+    msg = _cloud_msg([[1, 2, 3], [4, 5, 6]])
+    msg.row_step = 16
+    assert pointcloud2_to_xyz(msg) is None  # row_step < width*point_step
+
+
+def test_read_pointcloud2_pdu_matches_payload():
+    xyz = [[1, 2, 3], [4, 5, 6], [np.inf, 0, 0]]
+    msg = _cloud_msg(xyz)
+    msg.header.stamp.sec, msg.header.stamp.nanosec = 12, 34
+    raw = bytes(py_to_pdu_PointCloud2(msg))
+
+    head, data = read_pointcloud2_pdu(raw)
+    assert (head.header.stamp.sec, head.header.stamp.nanosec) == (12, 34)
+    assert [f.name for f in head.fields] == ["x", "y", "z"]
+    assert (head.width, head.height, head.point_step) == (3, 1, 16)
+    assert bytes(data) == msg.data
+    assert pointcloud2_to_xyz(head, data).tolist() == [[-2, 1, 3], [-5, 4, 6]]
+
+    assert read_pointcloud2_pdu(raw[:100]) is None
+    assert read_pointcloud2_pdu(raw[:-8]) is None  # data 領域が欠けている
+
+
+def test_point_cloud_prepare_and_set_points():
+    cloud = PointCloud(NodePath("root"), capacity=100, budget=10)
+    pts = np.random.default_rng(0).uniform(-1, 1, (50, 3)).astype(np.float32)
+    prepared = cloud.prepare(pts)
+    assert len(prepared) == 10
+
+    cloud.set_points(pts[:5])
+    assert cloud.count == 5
+    geom = cloud._geom
+    assert geom.get_primitive(0).get_num_vertices() == 5
+    reader = GeomVertexReader(geom.get_vertex_data(), "vertex")
+    for p in pts[:5]:
+        v = reader.get_data3()
+        assert np.allclose((v.x, v.y, v.z), p)
+
+    cloud.set_points(np.empty((0, 3), dtype=np.float32))
+    assert geom.get_primitive(0).get_num_vertices() == 0
@@ -0,0 +1,167 @@
+import struct
+import time
+
+from core.pose_stream import (
+    _HEADER, PoseStreamDecoder, PoseStreamEncoder, PoseStreamPublisher, PoseStreamSubscriber,
+    parse_addr,
+)
+
+
+def _fleet(n, moved=None, step=0.0):
+    fleet = {f"drone{i}": ((i * 0.1, 0.0, 1.0), (0.0, 0.0, 0.0), 0.0) for i in range(n)}
+    if moved is not None:
+        fleet[moved] = ((step, 0.5, 1.0), (step * 10.0, 0.0, 0.0), 40.0)
+    return fleet
+
+
+def _feed(decoder, chunks):
+    updated = False
+    for data in chunks:
+        updated = decoder.decode(data) or updated
+    return updated
+
+
+def _assert_close(got, expected):
+    assert set(got) == set(expected)
+    for name, (pos, hpr, rotor) in expected.items():
+        gpos, ghpr, grotor = got[name]
+        assert all(abs(a - b) < 1e-3 for a, b in zip(gpos, pos))
+        assert all(abs(a - b) < 1e-2 for a, b in zip(ghpr, hpr))
+        assert abs(grotor - rotor) < 0.1
+
+
+def test_round_trip_keyframe_and_delta():
+    enc = PoseStreamEncoder(keyframe_interval=5)
+    dec = PoseStreamDecoder()
+    for frame in range(12):
+        fleet = _fleet(20, moved="drone3", step=frame * 0.01)
+        assert _feed(dec, enc.encode(fleet))
+        _assert_close(dec.states(), fleet)
+
+
+def test_delta_only_carries_moving_entities():
+    enc = PoseStreamEncoder(keyframe_interval=100)
+    key = enc.encode(_fleet(500))
+    delta = enc.encode(_fleet(500, moved="drone3", step=0.01))
+    assert len(delta) == 1
+    assert len(delta[0]) < 64 < sum(len(c) for c in key)
+
+
+def test_large_fleet_is_split_into_datagrams():
+    enc = PoseStreamEncoder(chunk_bytes=1400)
+    dec = PoseStreamDecoder()
+    fleet = _fleet(3000)
+    chunks = enc.encode(fleet)
+    assert len(chunks) > 1
+    assert all(len(c) <= 1400 for c in chunks)
+    # 最後の1つが届くまでは未完成のキーフレームを返さない
+    assert not _feed(dec, chunks[:-1])
+    assert dec.decode(chunks[-1])
+    _assert_close(dec.states(), fleet)
+
+
+def test_lost_keyframe_chunk_waits_for_next_keyframe():
+    enc = PoseStreamEncoder(keyframe_interval=2, chunk_bytes=600)
+    dec = PoseStreamDecoder()
+    _feed(dec, enc.encode(_fleet(100))[1:])
+    assert not _feed(dec, enc.encode(_fleet(100, moved="drone1", step=0.1)))
+    enc.encode(_fleet(100))
+    fleet = _fleet(100, moved="drone1", step=0.2)
+    assert _feed(dec, enc.encode(fleet))
+    _assert_close(dec.states(), fleet)
+
+
+def test_decode_after_publisher_restart():
+    dec = PoseStreamDecoder()
+    enc = PoseStreamEncoder()
+    for frame in range(2000):
+        _feed(dec, enc.encode(_fleet(3, moved="drone0", step=frame * 0.001)))
+
+    restarted = PoseStreamEncoder()
+    decoded = 0
+    for frame in range(5):
+        fleet = _fleet(3, moved="drone1", step=frame * 0.01)
+        if _feed(dec, restarted.encode(fleet)):
+            _assert_close(dec.states(), fleet)
+            decoded += 1
+    assert decoded == 5
+
+
+def test_stale_packet_is_dropped():
+    enc = PoseStreamEncoder()
+    dec = PoseStreamDecoder()
+    assert _feed(dec, enc.encode(_fleet(3)))
+    old = enc.encode(_fleet(3, moved="drone0", step=0.1))
+    new = enc.encode(_fleet(3, moved="drone0", step=0.2))
+    assert _feed(dec, new)
+    assert not _feed(dec, old)
+
+
+def test_publisher_skips_oversize_names():
+    pub = PoseStreamPublisher([("127.0.0.1", 9)])
+    try:
+        fleet = _fleet(2)
+        fleet["x" * 300] = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), 0.0)
+        assert pub.publish(fleet) > 0
+    finally:
+        pub.close()
+
+
+def test_localhost_publish_subscribe():
+    sub = PoseStreamSubscriber(("localhost", 0))
+    port = sub.sock.getsockname()[1]
+    pub = PoseStreamPublisher([("127.0.0.1", port)])
+    try:
+        fleet = _fleet(10, moved="drone2", step=0.3)
+        pub.publish(fleet)
+        got = None
+        for _ in range(50):
+            got = sub.poll()
+            if got is not None:
+                break
+            time.sleep(0.01)
+        _assert_close(got, fleet)
+    finally:
+        pub.close()
+        sub.close()
+
+
+def test_malformed_datagrams_are_rejected():
+    enc = PoseStreamEncoder(keyframe_interval=100)
+    dec = PoseStreamDecoder()
+    fleet = _fleet(5)
+    key = enc.encode(fleet)[0]
+    delta = enc.encode(_fleet(5, moved="drone1", step=0.2))[0]
+
+    # 切り詰めたキーフレームは状態を壊さず無視される
+    for cut in range(len(key)):
+        assert not dec.decode(key[:cut])
+    assert dec.decode(key)
+    _assert_close(dec.states(), fleet)
+
+    for cut in range(len(delta)):
+        assert not dec.decode(delta[:cut])
+
+    # count > end - start のヘッダ
+    fields = list(_HEADER.unpack_from(delta, 0))
+    fields[-1] = 1000
+    assert not dec.decode(_HEADER.pack(*fields) + delta[_HEADER.size:])
+    # 担当範囲外のインデックス
+    fields = list(_HEADER.unpack_from(delta, 0))
+    fields[5:8] = [5, 0, 1]
+    bad = _HEADER.pack(*fields) + struct.pack("<IB", 3, 1) + struct.pack("<h", 5)
+    assert not dec.decode(bad)
+    # 無関係なデータ・不正な UTF-8 名
+    assert not dec.decode(b"\x00" * 64)
+    broken = bytearray(key)
+    broken[_HEADER.size + 1] = 0xFF
+    assert not dec.decode(bytes(broken))
+
+    _assert_close(dec.states(), fleet)
+    assert dec.decode(delta)
+
+
+def test_parse_addr_keeps_empty_host_for_bind():
+    assert parse_addr(":9000") == ("127.0.0.1", 9000)
+    assert parse_addr(":9000", default_host="") == ("", 9000)
+    assert parse_addr("localhost:9000", default_host="") == ("localhost", 9000)
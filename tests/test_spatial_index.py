@@ -0,0 +1,116 @@
+import math
+import random
+import time
+
+from core.spatial_index import ProximityTracker, SpatialGrid, _ray_sphere
+
+
+def _random_grid(n=1000, seed=1):
+    rng = random.Random(seed)
+    grid = SpatialGrid(cell_size=1.0)
+    pts = {}
+    for i in range(n):
+        p = (rng.uniform(-15, 15), rng.uniform(-15, 15), rng.uniform(0, 5))
+        pts[i] = p
+        grid.update(i, p)
+    return grid, pts, rng
+
+
+def test_queries_match_brute_force():
+    grid, pts, rng = _random_grid()
+    # 一部を移動させて差分更新も確認
+    for i in range(0, 1000, 7):
+        p = (rng.uniform(-15, 15), rng.uniform(-15, 15), rng.uniform(0, 5))
+        pts[i] = p
+        grid.update(i, p)
+    for _ in range(50):
+        c = (rng.uniform(-20, 20), rng.uniform(-20, 20), rng.uniform(-2, 7))
+        bf = sorted((math.dist(c, p), k) for k, p in pts.items())
+        assert [k for k, _ in grid.nearest(c, 5)] == [k for _, k in bf[:5]]
+        assert sorted(k for k, _ in grid.query_radius(c, 2.5)) == sorted(k for d, k in bf if d <= 2.5)
+
+        d = (rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1))
+        n = math.sqrt(sum(x * x for x in d))
+        dn = tuple(x / n for x in d)
+        hits = [(t, k) for k, p in pts.items()
+                if (t := _ray_sphere(c, dn, p, 0.3)) is not None and t <= 60]
+        hit = grid.raycast(c, d, 60, 0.3)
+        if hits:
+            assert hit[0] == min(hits)[1]
+        else:
+            assert hit is None
+
+
+def test_close_pairs_and_remove():
+    grid, pts, _ = _random_grid()
+    expected = sum(1 for a in pts for b in pts if a < b and math.dist(pts[a], pts[b]) < 0.3)
+    assert len(grid.close_pairs(0.3)) == expected
+    grid.remove(3)
+    assert 3 not in grid and len(grid) == 999
+
+
+def test_nearest_is_bounded_on_sparse_data():
+    grid = SpatialGrid(cell_size=1.0)
+    grid.update("Drone", (0.0, 0.0, 0.0))
+    grid.update("far", (300.0, 0.0, 0.0))
+    start = time.perf_counter()
+    assert grid.nearest((0, 0, 0), k=1, exclude="Drone") == [("far", 300.0)]
+    assert time.perf_counter() - start < 0.1
+
+
+def test_missed_raycast_is_bounded():
+    grid = SpatialGrid(cell_size=1.0)
+    grid.update("Drone", (0.0, 0.0, 1.0))
+    grid.update("other", (3.0, 0.0, 1.0))
+    start = time.perf_counter()
+    # カメラの near-far 全長（約100km）でも空振りで長時間回らない
+    assert grid.raycast((0.0, -5.0, 1.0), (0.0, -100000.0, 0.0), max_dist=100000.0) is None
+    assert grid.raycast((0.0, -5.0, 50.0), (0.0, 100000.0, 0.0), max_dist=100000.0) is None
+    hit = grid.raycast((3.0, -5.0, 1.0), (0.0, 100000.0, 0.0), max_dist=100000.0, radius=0.1)
+    assert hit is not None and hit[0] == "other" and abs(hit[1] - 4.9) < 1e-6
+    assert time.perf_counter() - start < 0.1
+
+
+def test_bounds_follow_moves():
+    grid = SpatialGrid(cell_size=1.0)
+    grid.update("a", (0.0, 0.0, 0.0))
+    grid.update("b", (50.0, 0.0, 0.0))
+    grid.raycast((0, -5, 0), (0, 1, 0))
+    grid.update("b", (-50.0, 0.0, 0.0))
+    hit = grid.raycast((-50.0, -5.0, 0.0), (0.0, 1.0, 0.0), max_dist=100.0)
+    assert hit is not None and hit[0] == "b"
+
+
+def test_proximity_tracker_matches_close_pairs():
+    grid, pts, rng = _random_grid(n=400)
+    tracker = ProximityTracker(grid, threshold=0.5)
+    tracker.update(list(pts))
+    for _ in range(20):
+        moved = rng.sample(list(pts), 15)
+        for key in moved:
+            p = (rng.uniform(-15, 15), rng.uniform(-15, 15), rng.uniform(0, 5))
+            pts[key] = p
+            grid.update(key, p)
+        removed = rng.choice(list(pts))
+        del pts[removed]
+        grid.remove(removed)
+        tracker.update(moved + [removed])
+
+        expected = {frozenset((a, b)) for a, b, _ in grid.close_pairs(0.5)}
+        assert {frozenset(p) for p in tracker.pairs()} == expected
+        assert tracker.warned() == {k for pair in expected for k in pair}
+
+
+def test_proximity_tracker_reports_changes_only():
+    grid = SpatialGrid(cell_size=1.0)
+    tracker = ProximityTracker(grid, threshold=0.5)
+    grid.update("a", (0.0, 0.0, 0.0))
+    grid.update("b", (3.0, 0.0, 0.0))
+    assert tracker.update(["a", "b"]) == set()
+    grid.update("b", (0.2, 0.0, 0.0))
+    assert tracker.update(["b"]) == {"a", "b"}
+    grid.update("b", (0.3, 0.0, 0.0))
+    assert tracker.update(["b"]) == set()
+    grid.remove("a")
+    assert tracker.update(["a"]) == {"a", "b"}
+    assert tracker.warned() == set()
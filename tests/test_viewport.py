@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("panda3d")
+
+from panda3d.core import loadPrcFileData
+
+loadPrcFileData("", "window-type offscreen\naudio-library-name null\nwin-size 800 600")
+
+from direct.showbase.ShowBase import ShowBase
+from core.camera import TopDownCamera
+from core.viewport import ViewportManager
+
+
+@pytest.fixture(scope="module")
+def base():
+    try:
+        base = ShowBase()
+    except Exception as e:
+        pytest.skip(f"offscreen buffer unavailable: {e}")
+    yield base
+    base.destroy()
+
+
+@pytest.fixture
+def views(base):
+    base.win.set_size(800, 600)
+    views = ViewportManager(base, get_target=lambda: None)
+    yield views
+    views.destroy()
+
+
+def _redraws(view, frames, dt):
+    # バッファは最初の描画で開かれるまで is_active() が False を返す
+    view.base.graphicsEngine.render_frame()
+    count = 0
+    for _ in range(frames):
+        view.buffer.set_active(False)
+        view.update(dt, None)
+        count += view.buffer.is_active()
+    return count
+
+
+def test_rate_accounting(views):
+    view = views.add("top", (0.5, 1.0, 0.5, 1.0), lambda np: TopDownCamera(np), rate_hz=10)
+    _redraws(view, 1, 1.0 / 60)  # add() 直後の1回を消化
+    # 1/60 の積算誤差で 0.1 に届かず、60フレームで9回しか描かれなかった
+    assert _redraws(view, 60, 1.0 / 60) == 10
+    assert _redraws(view, 600, 1.0 / 60) == 100
+    # 大きく遅れても溜まった分をまとめ描きしない
+    assert _redraws(view, 3, 1.0) == 3
+
+
+def test_show_and_toggle(views):
+    view = views.add("top", (0.5, 1.0, 0.5, 1.0), lambda np: TopDownCamera(np), rate_hz=10)
+    _redraws(view, 1, 0.0)
+    assert _redraws(view, 1, 0.0) == 0
+
+    views.toggle()
+    assert view.card.is_hidden()
+    assert not view.buffer.is_active()
+    views.toggle()
+    assert not view.card.is_hidden()
+    assert _redraws(view, 1, 0.0) == 1  # 再表示直後に描き直す
+
+
+def test_resize_follows_window(base, views):
+    view = views.add("top", (0.5, 1.0, 0.5, 1.0), lambda np: TopDownCamera(np), rate_hz=10)
+    assert (view.buffer.get_x_size(), view.buffer.get_y_size()) == (400, 300)
+
+    base.win.set_size(1000, 400)
+    views._on_window_event(base.win)
+    assert (view.buffer.get_x_size(), view.buffer.get_y_size()) == (500, 200)
+    assert view.lens.get_aspect_ratio() == pytest.approx(2.5)
+    assert _redraws(view, 1, 0.0) == 1
+
+
+def test_destroy_releases_views(base, views):
+    views.add("top", (0.5, 1.0, 0.5, 1.0), lambda np: TopDownCamera(np))
+    views.enable()
+    views.destroy()
+    assert views.views == []
+    assert not base.taskMgr.hasTaskNamed("viewport_update")
+    assert not views.isAccepting("window-event")
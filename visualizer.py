@@ -1,31 +1,33 @@
 from panda3d.core import NodePath, Vec3, Point3
 from primitive.polygon import Polygon, Cube, Plane
 from primitive.render import RenderEntity
+from primitive.point_cloud import PointCloud
 from direct.showbase.ShowBase import ShowBase
 from panda3d.core import TextNode
 from direct.gui.OnscreenText import OnscreenText
-from core.camera import OrbitCamera 
+from core.camera import OrbitCamera, ChaseCamera, TopDownCamera, FirstPersonCamera
 from core.light import LightRig
+from core.pose_stream import PoseStreamSubscriber, parse_addr
+from core.spatial_index import ProximityTracker, SpatialGrid
+from core.viewport import ViewportManager
+from typing import Optional, Tuple
 import panda3d
 import json
+import sys
 print(f"--- Running Panda3D Version: {panda3d.__version__} ---")
 
 class App(ShowBase):
-    def __init__(self):
+    def __init__(self, subscribe: Optional[Tuple[str, int]] = None, entity_name: str = 'Drone',
+                 multi_view: bool = False):
         super().__init__()
         self.disableMouse()
 
         self.render.setShaderAuto()
 
         with open('drone_config.json', 'r') as f:
-            config = json.load(f)
+            self.drone_config = json.load(f)
 
-        drone_model = self._create_entity_from_config(config, copy=False)
-
-        if 'children' in config:
-            for child_config in config['children']:
-                child_entity = self._create_entity_from_config(child_config, copy=True)
-                drone_model.add_child(child_entity)
+        drone_model = self._create_vehicle(copy=False)
 
         # --- 照明セットアップ（先に設定） ---
         self.lights = LightRig(self.render, shadows=True)
@@ -56,9 +58,36 @@ class App(ShowBase):
         )
         self.cam_ctrl.enable()
 
+        # --- 空間インデックス（近接警告・クリック選択） ---
+        self.entity_name = entity_name
+        self.entities = {entity_name: drone_model}
+        self.spatial = SpatialGrid(cell_size=1.0)
+        self.proximity_threshold = 0.5   # これより近い機体ペアを強調表示
+        self.pick_radius = 0.15          # クリック判定に使う機体の半径
+        self.pick_distance = 200.0       # クリック判定の最大距離
+        self.proximity = ProximityTracker(self.spatial, self.proximity_threshold)
+        self.selected = None
+        self._dirty = set(self.entities)  # 位置が変わった/消えたエンティティ
+        self._pending_poses = {}          # 別スレッドから届いた最新の姿勢
+        self.cam_ctrl.on_pick = self.pick
+        self.taskMgr.add(self.update_poses, "pose_apply_task")
+        self.taskMgr.add(self.update_spatial, "spatial_index_task")
+
+        # --- 副ビュー（選択機体のチェイス / 真上 / 一人称、10Hz で描画） ---
+        self.views = None
+        if multi_view:
+            ViewportManager.set_main_rate(60)
+            self.views = ViewportManager(self, get_target=self._view_target)
+            self.views.add("chase", (0.70, 1.00, 0.68, 1.00), lambda np: ChaseCamera(np), rate_hz=10)
+            self.views.add("top", (0.70, 1.00, 0.36, 0.68), lambda np: TopDownCamera(np), rate_hz=10)
+            self.views.add("fpv", (0.70, 1.00, 0.04, 0.36), lambda np: FirstPersonCamera(np), rate_hz=10)
+            self.views.enable()
+
         # キーバインド
         self.accept("1", lambda: self.lights.toggle(True))
         self.accept("2", lambda: self.lights.toggle(False))
+        if self.views is not None:
+            self.accept("3", self.views.toggle)
 
         # テキスト（右下）
         self.pos_text = OnscreenText(
@@ -67,6 +96,29 @@ class App(ShowBase):
         )
         self.taskMgr.add(self.update_text, "update_text_task")
 
+        # 点群オーバーレイ（機体に追従）
+        self.point_clouds = {}
+        self._cloud_robots = {}     # 点群のキー -> 追従する機体名
+        self._pending_clouds = {}
+        self.taskMgr.add(self.update_point_clouds, "point_cloud_task")
+
+        # リモート配信(hako_asset.py --publish)を受けて描画するクライアントモード
+        self.fleet_state = {}
+        self.pose_subscriber = None
+        if subscribe is not None:
+            self.pose_subscriber = PoseStreamSubscriber(subscribe)
+            self.taskMgr.add(self.update_pose_stream, "pose_stream_task")
+
+    def _create_vehicle(self, name: Optional[str] = None, copy: bool = True) -> RenderEntity:
+        """drone_config.json から機体（本体 + ロータ）を生成する"""
+        config = dict(self.drone_config)
+        if name is not None:
+            config['name'] = name
+        vehicle = self._create_entity_from_config(config, copy=copy)
+        for child_config in config.get('children', []):
+            vehicle.add_child(self._create_entity_from_config(child_config, copy=True))
+        return vehicle
+
     def _create_entity_from_config(self, config, copy=False):
         entity = RenderEntity(self.render, config['name'])
         entity.load_model(self.loader, config['model'], copy=copy)
@@ -77,15 +129,133 @@ class App(ShowBase):
         return entity
 
     def set_pose_and_rotation(self, pos: Vec3, hpr: Vec3, rotation_speed: float = 1.0):
-        self.entity.set_pos(x = pos.x, y = pos.y, z = pos.z)
-        self.entity.set_hpr(h = hpr.x, p = hpr.y, r = hpr.z)
+        """
+        別スレッド（hako_asset.py の run()）から呼んでよい。
+        最新の姿勢だけを保持し、次フレームの描画タスクで反映する。
+        """
+        self._pending_poses[self.entity_name] = (pos, hpr, rotation_speed)
+
+    def update_poses(self, task):
+        for name in list(self._pending_poses):
+            pose = self._pending_poses.pop(name, None)
+            if pose is not None:
+                self.set_vehicle_pose(name, *pose)
+        return task.cont
+
+    def set_vehicle_pose(self, name: str, pos: Vec3, hpr: Vec3, rotation_speed: float = 1.0):
+        """
+        name の機体の姿勢を更新する。未登録の機体は生成する。
+        モデル読み込みを伴うので描画スレッド（タスク）からのみ呼ぶこと。
+        """
+        entity = self.entities.get(name)
+        if entity is None:
+            entity = self._create_vehicle(name)
+            entity.np.set_tag('ShadowCaster', 'true')
+            self.entities[name] = entity
+        entity.set_pos(x = pos.x, y = pos.y, z = pos.z)
+        entity.set_hpr(h = hpr.x, p = hpr.y, r = hpr.z)
         index = 0
-        for rotor in self.entity.children:
+        for rotor in entity.children:
             if index % 2 == 0:
                 rotor.rotate_child_yaw(-rotation_speed)
             else:
                 rotor.rotate_child_yaw(rotation_speed)
             index += 1
+        self._dirty.add(name)
+
+    def remove_vehicle(self, name: str):
+        entity = self.entities.pop(name, None)
+        if entity is None:
+            return
+        entity.np.removeNode()
+        self.spatial.remove(name)
+        self._dirty.add(name)  # 近接関係から外す
+        if self.selected == name:
+            self.selected = None
+
+    def add_point_cloud(self, key, robot: Optional[str] = None, **kwargs) -> PointCloud:
+        """
+        robot の機体座標系で点群を表示する PointCloud を追加（kwargs は PointCloud に渡す）。
+        key は set_point_cloud() に渡す識別子（例: (robot, pdu)）。robot 省略時は自機。
+        機体がまだ無ければ、現れた時点でその機体に付け替える。
+        """
+        robot = self.entity_name if robot is None else robot
+        entity = self.entities.get(robot, self.entity)
+        name = "_".join(key) if isinstance(key, tuple) else str(key)
+        cloud = PointCloud(entity.np, name, **kwargs)
+        self.point_clouds[key] = cloud
+        self._cloud_robots[key] = robot
+        return cloud
+
+    def set_point_cloud(self, key, points):
+        """
+        別スレッドから呼んでよい。間引き(voxel/点数上限)は呼び出し側スレッドで行い、
+        最新の点群だけを次フレームで反映する。
+        """
+        cloud = self.point_clouds.get(key)
+        if cloud is not None:
+            self._pending_clouds[key] = cloud.prepare(points)
+
+    def update_point_clouds(self, task):
+        for key in list(self._pending_clouds):
+            points = self._pending_clouds.pop(key, None)
+            cloud = self.point_clouds.get(key)
+            if points is None or cloud is None:
+                continue
+            entity = self.entities.get(self._cloud_robots[key])
+            if entity is not None and cloud.np.get_parent() != entity.np:
+                cloud.np.reparent_to(entity.np)
+            cloud.set_points(points)
+        return task.cont
+
+    def _view_target(self):
+        """副ビューが追う機体（選択中、なければ自機）"""
+        entity = self.entities.get(self.selected) or self.entity
+        return entity.np
+
+    def pick(self, origin: Point3, direction: Vec3):
+        """視線レイに最初に当たったエンティティを選択し、カメラの注視点にする"""
+        hit = self.spatial.raycast(origin, direction,
+                                   max_dist=self.pick_distance, radius=self.pick_radius)
+        if hit is None:
+            return
+        self.selected = hit[0]
+        self.cam_ctrl.set_target(Point3(*self.spatial.position(self.selected)))
+
+    def update_spatial(self, task):
+        if not self._dirty:
+            return task.cont
+        # 位置が変わったエンティティだけをインデックスへ反映
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            entity = self.entities.get(name)
+            if entity is not None:
+                self.spatial.update(name, entity.np.getPos(self.render))
+        if self.selected in dirty and self.selected in self.spatial:
+            self.cam_ctrl.set_target(Point3(*self.spatial.position(self.selected)))
+
+        # 動いた機体の近傍だけ近接判定し直し、状態が変わった機体の強調を切り替える
+        for name in self.proximity.update(dirty):
+            entity = self.entities.get(name)
+            if entity is None:
+                continue
+            if self.proximity.is_warned(name):
+                entity.np.setColorScale(1.0, 0.3, 0.3, 1.0)
+            else:
+                entity.np.clearColorScale()
+        return task.cont
+
+    def update_pose_stream(self, task):
+        states = self.pose_subscriber.poll()
+        if states is not None:
+            self.fleet_state = states
+            # 配信されたフリート全体を機体ごとに反映（消えた機体は削除）
+            for name, (pos, hpr, rotor_speed) in states.items():
+                self.set_vehicle_pose(name, Vec3(*pos), Vec3(*hpr), rotor_speed)
+            for name in list(self.entities):
+                if name != self.entity_name and name not in states:
+                    self.remove_vehicle(name)
+        return task.cont
 
     def update_text(self, task):
         pos = self.entity.np.getPos(self.render)
@@ -93,4 +263,15 @@ class App(ShowBase):
         return task.cont
 
 if __name__ == "__main__":
-    App().run()
\ No newline at end of file
+    # python visualizer.py [--subscribe [host]:port] [--multi-view]
+    #   host 省略時は全インタフェースで受信する
+    args = sys.argv[1:]
+    subscribe = None
+    if '--subscribe' in args:
+        i = args.index('--subscribe') + 1
+        try:
+            subscribe = parse_addr(args[i], default_host="")
+        except (IndexError, ValueError):
+            print(f"Usage: {sys.argv[0]} [--subscribe [host]:port] [--multi-view]")
+            sys.exit(1)
+    App(subscribe=subscribe, multi_view='--multi-view' in args).run()